@@ -25,8 +25,9 @@ __version__ = '2.1'
 
 import sys, os, atexit, signal
 from contextlib import ExitStack, ContextDecorator
+from collections import deque
 from dataclasses import dataclass
-from typing import Any, Optional, List, Callable, Type, Union
+from typing import Any, Optional, Deque, Callable, Type, Union
 from types import TracebackType, FrameType
 
 
@@ -44,11 +45,14 @@ else:
 _debug('initializing ...')
 
 
-@dataclass
+@dataclass(eq=False)
 class _BarItem:
     '''Text, label combination to populate _BottomBar.
 
-    Dataclass consisting of the mutable fields text and label.'''
+    Dataclass consisting of the mutable fields text and label. Items compare by
+    identity, such that removal from the bar never evaluates text equality.'''
+
+    __slots__ = 'text', 'label'
 
     text: Any
     label: Optional[str]
@@ -62,11 +66,11 @@ class _BottomBar:
     signals if the bar presently contains any items.'''
 
     def __init__(self) -> None:
-        self.__nleft = 0
-        self.__items: List[_BarItem] = []
+        self.__left: Deque[_BarItem] = deque() # ordered left to right
+        self.__right: Deque[_BarItem] = deque() # ordered left to right
 
     def __bool__(self) -> bool:
-        return bool(self.__items)
+        return bool(self.__left or self.__right)
 
     def add(self, text: Any, *, right: bool, label: Optional[str]) -> _BarItem:
         '''Create a bar item and add it to the bar.
@@ -76,18 +80,19 @@ class _BottomBar:
         modification and removal.'''
 
         c = _BarItem(text, label)
-        self.__items.insert(self.__nleft, c)
-        if not right:
-            self.__nleft += 1
+        if right:
+            self.__right.appendleft(c)
+        else:
+            self.__left.append(c)
         return c
 
     def remove(self, item: _BarItem) -> None:
         '''Remove a bar item.'''
 
-        index = self.__items.index(item)
-        del self.__items[index]
-        if index < self.__nleft:
-            self.__nleft -= 1
+        try:
+            self.__left.remove(item)
+        except ValueError:
+            self.__right.remove(item)
 
     def format(self, length: int) -> str:
         '''Generate bar string of given length.
@@ -100,25 +105,39 @@ class _BottomBar:
 
         itemsep = ' | '
         labelsep = ': '
-        nitems = len(self.__items)
+        items = [*self.__left, *self.__right]
+        nleft = len(self.__left)
+        nitems = len(items)
         maxchars = length - len(itemsep) * (nitems - 1)
         if maxchars <= 2 * nitems:
             return '#' * length
-        texts = [str(item.text) for item in self.__items]
-        whitespace = maxchars - sum(map(len, texts))
+        if nitems == 1:
+            # single item; shortcut of the general procedure below
+            item, = items
+            text = str(item.text)
+            if len(text) > length:
+                text = text[:length-2] + '..'
+            elif item.label and len(item.label) + len(labelsep) + len(text) <= length:
+                text = labelsep.join((item.label, text))
+            return text.ljust(length) if nleft else text.rjust(length)
+        texts = [str(item.text) for item in items]
+        labels = [item.label for item in items]
+        lengths = [len(text) for text in texts]
+        whitespace = maxchars - sum(lengths)
         if whitespace < 0:
             # not all items fit; shorten the longest ones
-            for i in sorted(range(nitems), key=lambda i: len(texts[i])): # argsort
+            for i in sorted(range(nitems), key=lengths.__getitem__): # argsort
                 maxlen = maxchars // nitems # >= 2 since maxchars > 2 * nitems
-                if len(texts[i]) >= maxlen:
+                if lengths[i] >= maxlen:
                     texts[i] = texts[i][:maxlen-2] + '..'
-                maxchars -= len(texts[i])
+                    lengths[i] = maxlen
+                maxchars -= lengths[i]
                 nitems -= 1
-        elif whitespace >= sum(len(item.label) + len(labelsep) for item in self.__items if item.label):
+        elif any(labels) and whitespace >= sum(len(label) + len(labelsep) for label in labels if label):
             # labels fit; prepend to texts
-            texts = [labelsep.join((item.label, text)) if item.label else text for item, text in zip(self.__items, texts)]
-        left = itemsep.join(texts[:self.__nleft])
-        right = itemsep.join(texts[self.__nleft:])
+            texts = [labelsep.join((label, text)) if label else text for label, text in zip(labels, texts)]
+        left = itemsep.join(texts[:nleft])
+        right = itemsep.join(texts[nleft:])
         return left.ljust(length - len(right)) + right
 
 
@@ -132,25 +151,56 @@ class _Terminal:
 
     def __init__(self) -> None:
         self.__size: Optional[os.terminal_size] = None # a None value signifies that the scroll region is not set
-        self.__stdout = open(sys.stdout.fileno(), mode='wb', buffering=0, closefd=False)
+        self.__last_bar = '' # bar as last printed, to skip identical repaints
+        self.__pending = b'' # scroll region setup to be written along with the next bar
+        self.__print_prefix = b'' # control sequences preceding the bar, depending on the terminal height
+        self.__removal = b'' # control sequences removing the bar, depending on the terminal height
+        self.__invalid = True # signifies that the terminal size and scroll region may have changed since last set
+        self.__fileno = sys.stdout.fileno()
+        self.__sigterm_pid = 0 # process that installed the SIGTERM handler
 
         # make sure we can query the terminal size
         size = os.get_terminal_size()
         _debug(f'terminal size: {size.columns}x{size.lines}')
 
-    def prepare_bar(self) -> int:
+    def invalidate(self) -> None:
+        '''Notify that the terminal state may have changed.
+
+        The terminal size will be queried anew by the next prepare_bar, which
+        will also set the scroll region again, even if the size turns out to be
+        unchanged, causing the next print_bar to repaint the bar. This serves to
+        handle resize events, as terminals may reset the scroll region while
+        resizing, as well as to repair the bar after a terminal reset.'''
+
+        self.__invalid = True
+
+    def prepare_bar(self, poll: bool = True) -> int:
         '''Create open line and set scroll region.
 
         If the scroll region is not currently set, scroll by one line if the
         cursor is at the bottom of the terminal to make place for a status bar,
-        and set the scroll region to exclude the bottom line. The width of the
-        terminal is returned for formatting purposes.'''
-
-        size = os.get_terminal_size()
-        if size != self.__size:
+        and set the scroll region to exclude the bottom line. The corresponding
+        control sequences are held back until the next print_bar, so that both
+        reach the terminal in a single write. The width of the terminal is
+        returned for formatting purposes.
+
+        If poll is False the terminal size is assumed to be unchanged unless the
+        invalidate method was called, in which case the costly size query can be
+        avoided.'''
+
+        invalid = self.__invalid
+        if poll or invalid or self.__size is None:
+            self.__invalid = False
+            size = os.get_terminal_size()
+        else:
+            size = self.__size
+        if invalid or size != self.__size:
             scroll = size.lines - 1
             _debug(f'setting scroll region to {scroll} lines')
-            self.__stdout.write(
+            if self.__size is None and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+                self.__sigterm_pid = os.getpid()
+                self.__set_sigterm(self.__terminate)
+            self.__pending = (
                 b'\0337' # save cursor and attributes
                 b'\033[r' # reset scroll region (moves cursor)
                 b'\0338' # restore cursor and attributes
@@ -160,42 +210,81 @@ class _Terminal:
                 b'\033[1;%dr' # set scroll region
                 b'\0338' # restore cursor and attributes
                 % scroll)
+            self.__print_prefix = (
+                b'\0337' # save cursor and attributes
+                b'\033[%d;1H' # move cursor to bottom row, first column
+                b'\033[?7l' # disable line wrap
+                b'\033[0m' # clear attributes
+                % size.lines)
+            self.__removal = (
+                b'\0337' # save cursor position
+                b'\033[%d;1H' # move cursor to bottom row, first column
+                b'\033[K' # clear entire line
+                b'\033[r' # reset scroll region
+                b'\0338' # restore cursor position
+                % size.lines)
             self.__size = size
         return size.columns
 
     def print_bar(self, bar: str) -> None:
         '''Print string at the bottom line of the terminal.
 
-        This method assumes that prepare_bar was already called.'''
+        This method assumes that prepare_bar was already called, and writes any
+        pending scroll region setup along with the bar. If the bar is identical
+        to the one printed last, and the terminal size did not change in the
+        meantime, the terminal is left untouched.'''
 
         assert self.__size, 'print_bar requires prepare_bar'
 
-        self.__stdout.write(
-            b'\0337' # save cursor and attributes
-            b'\033[%d;1H' # move cursor to bottom row, first column
-            b'\033[?7l' # disable line wrap
-            b'\033[0m' # clear attributes
-            b'%s' # print bar
+        if bar == self.__last_bar and not self.__pending:
+            return
+        self.__write(self.__pending, self.__print_prefix, bar.encode(),
             b'\033[?7h' # enable line wrap
-            b'\0338' # restore cursor and attributes
-            % (self.__size.lines, bar.encode()))
+            b'\0338') # restore cursor and attributes
+        self.__last_bar = bar
+        self.__pending = b''
 
     def remove_bar(self) -> None:
         '''Clear bottom line and reset scroll region.
 
         If the scroll region is currently set, clear the bottom line and reset
-        the scroll region to include the entire terminal.'''
+        the scroll region to include the entire terminal. The SIGTERM handler is
+        restored as well; if this is not possible because the method is called
+        outside the main thread, it is retried by the next call.'''
 
         if self.__size is not None:
             _debug('restoring scroll region')
-            self.__stdout.write(
-                b'\0337' # save cursor position
-                b'\033[%d;1H' # move cursor to bottom row, first column
-                b'\033[K' # clear entire line
-                b'\033[r' # reset scroll region
-                b'\0338' # restore cursor position
-                % self.__size.lines)
+            self.__write(self.__removal)
             self.__size = None
+            self.__pending = b''
+        if signal.getsignal(signal.SIGTERM) == self.__terminate:
+            self.__set_sigterm(signal.SIG_DFL)
+
+    def __terminate(self, sig: int, frame: Optional[FrameType]) -> None:
+        '''Remove the bar and terminate with the default action of SIGTERM.
+
+        A forked child inherits the handler, but the bar belongs to the parent
+        process, so in that case the bar is left untouched.'''
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL) # signal handlers run in the main thread
+        if os.getpid() == self.__sigterm_pid:
+            self.remove_bar()
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    def __set_sigterm(self, handler: Union[Callable[[int, Optional[FrameType]], None], signal.Handlers]) -> None:
+        '''Install SIGTERM handler, if possible.'''
+
+        try:
+            signal.signal(signal.SIGTERM, handler)
+        except ValueError as e: # not called from the main thread
+            _debug(f'cannot set SIGTERM handler: {e}')
+
+    def __write(self, *parts: bytes) -> None:
+        '''Write the concatenation of parts to the terminal in a single call.'''
+
+        data = memoryview(b''.join(parts))
+        while data:
+            data = data[os.write(self.__fileno, data):]
 
 
 class Auto:
@@ -208,15 +297,25 @@ class Auto:
 
     On other platforms, or if signal handlers are already in place, the class
     creates a thread upon first registration, from which the handler is called
-    at a given refresh rate, and the screen size is polled every second.'''
+    at a given refresh rate, and the screen size is polled at an interval that
+    grows from one to eight seconds while the size remains unchanged.
+
+    The optional resize handler is called prior to the handler in case of a
+    resize event, but only if resize events are signalled by the operating
+    system, as indicated by the notifies_resize property.'''
 
     __active: Optional[Union['__thread_based', '__signal_based']]
 
-    def __init__(self, handler: Callable[[], None]) -> None:
+    def __init__(self, handler: Callable[[], None], resize_handler: Callable[[], None] = lambda: None) -> None:
         self.__handler = handler
+        self.__resize_handler = resize_handler
         self.__active = None
         self.__refresh = float('inf')
 
+    @property
+    def notifies_resize(self) -> bool:
+        return isinstance(self.__active, self.__signal_based)
+
     def __call__(self, refresh: float) -> ExitStack:
         restore = ExitStack()
         if not self.__active:
@@ -232,7 +331,7 @@ class Auto:
         try:
             if os.getenv('BOTTOMBAR_THREAD_BASED', False):
                 raise RuntimeError('variable BOTTOMBAR_THREAD_BASED is set')
-            self.__active = self.__signal_based(self.__handler)
+            self.__active = self.__signal_based(self.__handler, self.__resize_handler)
         except Exception as e:
             _debug(f'not selecting signal based auto-redraw handler: {e}')
             self.__active = self.__thread_based(self.__handler)
@@ -249,19 +348,35 @@ class Auto:
         self.__refresh = refresh
 
     class __signal_based:
-        def __init__(self, handler: Callable[[], None]) -> None:
+        resize_delay = .05 # window in which bursts of resize events are coalesced
+        def __init__(self, handler: Callable[[], None], resize_handler: Callable[[], None]) -> None:
             for sig in signal.SIGALRM, signal.SIGWINCH:
                 if signal.getsignal(sig) != signal.SIG_DFL:
                     raise RuntimeError(f'signal {sig.name} is in use')
-                signal.signal(sig, lambda sig, frame: handler())
+            self.refresh = float('inf')
+            self.resize_pending = False
+            def on_alarm(sig: int, frame: Optional[FrameType]) -> None:
+                self.resize_pending = False
+                handler()
+            def on_resize(sig: int, frame: Optional[FrameType]) -> None:
+                resize_handler()
+                if not self.resize_pending:
+                    # defer the redraw to the alarm handler
+                    self.resize_pending = True
+                    self.start_timer()
+            signal.signal(signal.SIGALRM, on_alarm)
+            signal.signal(signal.SIGWINCH, on_resize)
+            for sig in signal.SIGALRM, signal.SIGWINCH:
                 signal.siginterrupt(sig, False) # restart any interrupted system calls
             signal.setitimer(signal.ITIMER_REAL, 0.)
+            resize_handler() # resize events may have gone unnoticed until now
             _debug('started signal based auto-redraw handler')
         def set(self, refresh: float) -> None:
-            if refresh < float('inf'):
-                signal.setitimer(signal.ITIMER_REAL, refresh, refresh)
-            else:
-                signal.setitimer(signal.ITIMER_REAL, 0.)
+            self.refresh = refresh
+            self.start_timer()
+        def start_timer(self) -> None:
+            interval = self.refresh if self.refresh < float('inf') else 0.
+            signal.setitimer(signal.ITIMER_REAL, self.resize_delay if self.resize_pending else interval, interval)
         def close(self) -> None:
             for sig in signal.SIGALRM, signal.SIGWINCH:
                 signal.signal(sig, signal.SIG_DFL)
@@ -284,7 +399,9 @@ class Auto:
         def __run(self, handler: Callable[[], None]) -> None:
             _debug('started thread based auto-redraw handler')
             timeout = self.refresh
-            poll_rate = 1.
+            min_poll_rate = 1.
+            max_poll_rate = 8.
+            poll_rate = min_poll_rate
             size = os.get_terminal_size()
             while timeout:
                 if not self.lock.acquire(timeout=min(timeout, poll_rate)):
@@ -294,19 +411,23 @@ class Auto:
                         size = os.get_terminal_size()
                         if size == old_size:
                             timeout -= poll_rate
+                            poll_rate = min(2 * poll_rate, max_poll_rate) # back off while idle
                             continue
                         # size changed
                     handler()
                 timeout = self.refresh
+                poll_rate = min_poll_rate
             _debug('stopped thread based auto-redraw handler')
 
 
 _bbar = _BottomBar()
+_batch_depth = 0 # number of entered batch contexts, during which redraws are deferred
 
 
 # Public API
 
 redraw: Callable[[], None]
+_redraw: Callable[[], None]
 auto_redraw: Callable[[float], ExitStack]
 
 try:
@@ -323,20 +444,35 @@ except Exception as e:
     def redraw() -> None:
         pass
 
+    def _redraw() -> None:
+        pass
+
     def auto_redraw(refresh: float = float('inf')) -> ExitStack:
         return ExitStack()
 
 else:
 
     def redraw() -> None:
-        '''Redraw the bottom bar.'''
+        '''Redraw the bottom bar.
+
+        The bar is repainted unconditionally, which can be used to repair it
+        after the terminal was cleared or reset.'''
 
+        _term.invalidate()
+        _redraw()
+
+    def _redraw() -> None:
+        '''Redraw the bottom bar if its contents or the terminal size changed.'''
+
+        if _batch_depth:
+            return
         if _bbar:
-            _term.print_bar(_bbar.format(_term.prepare_bar()))
+            _term.print_bar(_bbar.format(_term.prepare_bar(poll=not _auto.notifies_resize)))
         else:
             _term.remove_bar()
 
-    auto_redraw = Auto(redraw)
+    _auto = Auto(_redraw, _term.invalidate)
+    auto_redraw = _auto
 
     atexit.register(_term.remove_bar)
 
@@ -351,7 +487,7 @@ class add(ContextDecorator):
     def __init__(self, text: Any, *, right: bool = False, label: Optional[str] = None, refresh: float = float('inf')) -> None:
         self.__item = _bbar.add(text, right=right, label=label)
         self.__redraw_handle = auto_redraw(refresh)
-        redraw()
+        _redraw()
 
     @property
     def text(self) -> Any:
@@ -360,7 +496,7 @@ class add(ContextDecorator):
     @text.setter
     def text(self, value: Any) -> None:
         self.__item.text = value
-        redraw()
+        _redraw()
 
     @property
     def label(self) -> Optional[str]:
@@ -369,7 +505,7 @@ class add(ContextDecorator):
     @label.setter
     def label(self, value: Optional[str]) -> None:
         self.__item.label = value
-        redraw()
+        _redraw()
 
     def __enter__(self) -> 'add':
         return self
@@ -380,7 +516,25 @@ class add(ContextDecorator):
     def pop(self) -> None:
         _bbar.remove(self.__item)
         self.__redraw_handle.close()
-        redraw()
+        _redraw()
+
+
+class batch(ContextDecorator):
+    '''Defer redraws until the end of the context.
+
+    Within this context, changes to the bar, including the addition and removal
+    of items, are not drawn until the outermost batch context exits, upon which
+    the bar is redrawn once.'''
+
+    def __enter__(self) -> 'batch':
+        global _batch_depth
+        _batch_depth += 1
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_val: Optional[BaseException], exc_tb: Optional[TracebackType]) -> None:
+        global _batch_depth
+        _batch_depth -= 1
+        _redraw()
 
 
 _debug('initialization complete.')
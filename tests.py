@@ -27,8 +27,14 @@ with bb.add('foo...') as item:
     item.text = 'bar!'
     input('   b. check that the bottom line shows "bar!" (and nothing more)')
     input('   c. check that this {}long sentence wraps without overwriting "bar!"'.format('very ' * 40))
-input('   d. check that the bar is removed and the last line is open')
-input('   e. check that this text appears on the last line')
+    with bb.batch():
+        item.text = 'baz'
+        with bb.batch():
+            item.label = 'batch'
+        item.text = 'qux'
+    input('   d. check that the bottom line shows "batch: qux"')
+input('   e. check that the bar is removed and the last line is open')
+input('   f. check that this text appears on the last line')
 
 print('3. formatting tests')
 with bb.add('x', label='item1') as item1: